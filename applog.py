@@ -0,0 +1,232 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler, WatchedFileHandler
+
+from flask import g, has_request_context, request
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+_STOP = object()
+DROP_REPORT_INTERVAL = 10.0  # Seconds between "records dropped" lines while the queue overflows
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields merged in."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Tag records logged while handling a request with that request's id."""
+
+    def filter(self, record):
+        if has_request_context() and 'request_id' in g and not hasattr(record, 'request_id'):
+            record.request_id = g.request_id
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the request thread: when the writer falls behind, records are dropped and counted."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BulkRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that writes, rotates and flushes a whole batch at once."""
+
+    def emit_batch(self, records):
+        text = ''.join(self.format(record) + self.terminator for record in records)
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.stream.tell() > 0 and self.stream.tell() + len(text) > self.maxBytes:
+                self.doRollover()
+            self.stream.write(text)
+            self.stream.flush()
+
+
+class BulkWatchedFileHandler(WatchedFileHandler):
+    """For a file shared by every worker: each batch is one O_APPEND write, and the
+    file is reopened once an outside tool like logrotate has moved it away."""
+
+    def __init__(self, filename, delay=True):
+        # Binary and buffered, so a batch reaches the file in a single write() call
+        super().__init__(filename, mode='ab', delay=delay)
+
+    def emit_batch(self, records):
+        data = ''.join(self.format(record) + self.terminator for record in records).encode('utf-8')
+        with self.lock:
+            self.reopenIfNeeded()
+            if self.stream is None:
+                self.stream = self._open()
+                self._statstream()
+            self.stream.write(data)
+            self.stream.flush()
+
+
+class BulkStreamHandler(logging.StreamHandler):
+    def emit_batch(self, records):
+        with self.lock:
+            self.stream.write(''.join(self.format(record) + self.terminator for record in records))
+            self.flush()
+
+
+class LogWriter:
+    """Background thread draining the log queue in batches; one per worker process.
+
+    Records the queue handler had to drop are reported as a WARNING line of
+    their own, at most every DROP_REPORT_INTERVAL seconds.
+    """
+
+    def __init__(self, log_queue, handler, queue_handler=None, batch_size=512):
+        self.queue = log_queue
+        self.handler = handler
+        self.queue_handler = queue_handler
+        self.batch_size = batch_size
+        self._thread = None
+        self._reported_drops = 0
+        self._last_report = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _unreported_drops(self):
+        return self.queue_handler.dropped - self._reported_drops if self.queue_handler else 0
+
+    def _drop_report(self, force=False):
+        dropped = self._unreported_drops()
+        if not dropped or (not force and time.monotonic() - self._last_report < DROP_REPORT_INTERVAL):
+            return []
+        self._reported_drops += dropped
+        self._last_report = time.monotonic()
+        record = logging.makeLogRecord({
+            'name': 'applog', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': '%d log records dropped, the log writer fell behind', 'args': (dropped,),
+            'dropped': dropped,
+        })
+        return [record]
+
+    def _run(self):
+        while True:
+            # Wake up without new records too, so the last drops still get reported
+            try:
+                batch = [self.queue.get(timeout=DROP_REPORT_INTERVAL if self._unreported_drops() else None)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = _STOP in batch
+            records = [record for record in batch if record is not _STOP] + self._drop_report(force=stopping)
+            if records:
+                try:
+                    self.handler.emit_batch(records)
+                except Exception:
+                    self.handler.handleError(records[0])
+            if stopping:
+                self.handler.close()
+                return
+
+
+def configure_logging(app):
+    """Route app.logger through a queue to a batching writer and log every request as JSON.
+
+    A LOG_FILE shared by all workers is only appended to; rotate it with
+    logrotate, since workers rotating it independently would lose lines. With
+    '{pid}' in LOG_FILE each worker has its own file and rotates it by size.
+    An empty LOG_FILE writes to stderr instead.
+    """
+    log_file = app.config['LOG_FILE']
+    if log_file and '{pid}' not in log_file:
+        handler = BulkWatchedFileHandler(log_file)
+    elif log_file:
+        handler = BulkRotatingFileHandler(log_file.format(pid=os.getpid()),
+                                          maxBytes=app.config['LOG_MAX_BYTES'],
+                                          backupCount=app.config['LOG_BACKUP_COUNT'],
+                                          delay=True)
+    else:
+        handler = BulkStreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE'])
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    app.logger.handlers.clear()
+    app.logger.addHandler(queue_handler)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    app.logger.propagate = False
+
+    writer = LogWriter(log_queue, handler, queue_handler)
+    writer.start()
+    atexit.register(writer.stop)
+
+    def restart_in_child():
+        # Threads don't survive fork (gunicorn --preload), so each worker starts its own writer
+        # and a fresh queue, since the parent's may have been forked mid-put.
+        nonlocal writer
+        if log_file:
+            if handler.stream is not None:
+                handler.stream.close()
+            handler.stream = None
+            handler.baseFilename = os.path.abspath(log_file.format(pid=os.getpid()))
+        queue_handler.queue = queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE'])
+        queue_handler.dropped = 0
+        writer = LogWriter(queue_handler.queue, handler, queue_handler)
+        writer.start()
+        atexit.register(writer.stop)
+
+    os.register_at_fork(after_in_child=restart_in_child)
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def finish_request_log(response):
+        if 'request_start' in g:
+            app.logger.info('request', extra={
+                'method': request.method,
+                'route': request.url_rule.rule if request.url_rule else request.path,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.request_start) * 1000, 2),
+            })
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    return queue_handler
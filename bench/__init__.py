@@ -0,0 +1 @@
+"""Load-testing suite for app.py, run with `python -m bench`."""
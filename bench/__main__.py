@@ -0,0 +1,97 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from bench.load import DEFAULT_MIX, run_load
+from bench.report import compare, print_header, print_runs, summarize
+from bench.server import BASE_DIR, GunicornServer, worker_class_available
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}', expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return mix
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench",
+                                     description="Load-test app.py under gunicorn and save the results as JSON.")
+    parser.add_argument("--worker-classes", default="sync,gthread,gevent")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated client counts.")
+    parser.add_argument("--workers", type=int, default=2, help="Gunicorn worker processes.")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per worker for gthread.")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per run.")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="Scenario weights, e.g. index=40,static=30,dashboard=15,login=10,signup=5")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scrypt-n", type=int, default=None, help="Override SCRYPT_N for the server.")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Fractional throughput drop or p99 rise that counts as a regression.")
+    args = parser.parse_args()
+
+    extra_env = {"SCRYPT_N": str(args.scrypt_n)} if args.scrypt_n else {}
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "workers": args.workers,
+            "threads": args.threads,
+            "duration_s": args.duration,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "runs": [],
+    }
+
+    print_header()
+    for worker_class in args.worker_classes.split(","):
+        if not worker_class_available(worker_class):
+            print(f"Skipping {worker_class}: not installed", file=sys.stderr)
+            continue
+        for concurrency in map(int, args.concurrency.split(",")):
+            # A fresh server per run, so one run's database and caches don't leak into the next
+            try:
+                with GunicornServer(worker_class, args.workers, args.threads, extra_env) as server:
+                    latencies, errors, elapsed = run_load("127.0.0.1", server.port, concurrency,
+                                                          args.duration, args.mix, args.seed)
+                    run = {"worker_class": worker_class, "concurrency": concurrency}
+                    run.update(summarize(latencies, errors, elapsed))
+                    run["rss_mb_per_worker"] = sorted(server.worker_rss_mb().values())
+            except RuntimeError as e:
+                sys.exit(f"{worker_class}/c{concurrency}: {e}")
+            results["runs"].append(run)
+            print_runs([run])
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import http.client
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import defaultdict
+
+# Default share of requests per scenario, roughly what the site sees
+DEFAULT_MIX = {"index": 40, "static": 30, "dashboard": 15, "login": 10, "signup": 5}
+# Where each scenario may redirect to; any other redirect counts as an error
+EXPECTED_REDIRECTS = {"login": "/dashboard", "signup": "/dashboard"}
+BENCH_PASSWORD = "benchmark-password"
+STATIC_URL_RE = re.compile(r"""/static/[^"'()\s,]+""")
+
+
+class Client:
+    """One keep-alive connection with its own session cookie."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.cookie = None
+
+    def request(self, method, path, form=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            # Drop the broken connection; the next request reconnects
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            raise
+        cookie = response.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        return response.status, data, response.getheader("Location")
+
+
+def redirect_path(location):
+    return urllib.parse.urlsplit(location or "").path
+
+
+def discover_static_urls(host, port):
+    status, body, _ = Client(host, port).request("GET", "/")
+    if status != 200:
+        raise RuntimeError(f"GET / returned {status}, can't discover static URLs")
+    urls = sorted(set(STATIC_URL_RE.findall(body.decode("utf-8", "replace"))))
+    if not urls:
+        raise RuntimeError(f"GET / returned no /static/ URLs ({len(body)} bytes), nothing to load-test")
+    return urls
+
+
+def seed_user(host, port):
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    status, _, location = Client(host, port).request(
+        "POST", "/signup", form={"name": "Bench", "email": email, "password": BENCH_PASSWORD})
+    if status != 302 or redirect_path(location) != "/dashboard":
+        raise RuntimeError(f"Signing up {email} returned {status} {location or ''}, no user to log in as")
+    return email
+
+
+def log_in(client, email):
+    status, _, location = client.request("POST", "/login", form={"email": email, "password": BENCH_PASSWORD})
+    if status != 302 or redirect_path(location) != "/dashboard":
+        raise RuntimeError(f"Logging in as {email} returned {status} {location or ''}, "
+                           "dashboard requests would only measure redirects")
+
+
+def run_load(host, port, concurrency, duration, mix=None, seed=0):
+    """Drive `concurrency` keep-alive clients for `duration` seconds; return per-scenario latencies."""
+    mix = mix or DEFAULT_MIX
+    static_urls = discover_static_urls(host, port)
+    email = seed_user(host, port)
+    scenarios, weights = zip(*[(name, weight) for name, weight in mix.items() if weight > 0])
+
+    # Everyone logs in first, here so a failure stops the run instead of skewing it
+    clients = [Client(host, port) for _ in range(concurrency)]
+    for client in clients:
+        log_in(client, email)
+    for client in clients:
+        client.conn.close()  # The first logins' keep-alives may have timed out; reconnect on first use
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    # The clock starts for all clients at once
+    start_gate = threading.Barrier(concurrency + 1)
+
+    def user(index):
+        rng = random.Random(seed * 1000 + index)  # Same mix on every run for a given seed
+        client = clients[index]
+        dashboard_cookie = client.cookie
+        local, local_errors = defaultdict(list), defaultdict(int)
+        start_gate.wait()
+        deadline = time.perf_counter() + duration
+
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            client.cookie = dashboard_cookie if scenario == "dashboard" else None
+            if scenario == "index":
+                args = ("GET", "/")
+            elif scenario == "static":
+                args = ("GET", rng.choice(static_urls), None, {"Accept-Encoding": "br, gzip"})
+            elif scenario == "dashboard":
+                args = ("GET", "/dashboard")
+            elif scenario == "login":
+                args = ("POST", "/login", {"email": email, "password": BENCH_PASSWORD})
+            else:
+                args = ("POST", "/signup", {"name": "Bench", "email": f"{uuid.uuid4().hex}@example.com",
+                                            "password": BENCH_PASSWORD})
+            started = time.perf_counter()
+            try:
+                status, _, location = client.request(*args)
+            except (OSError, http.client.HTTPException):
+                local_errors[scenario] += 1
+                continue
+            local[scenario].append(time.perf_counter() - started)
+            # e.g. /dashboard bouncing to /login means the session was lost
+            redirected_wrong = 300 <= status < 400 and redirect_path(location) != EXPECTED_REDIRECTS.get(scenario)
+            if status >= 400 or redirected_wrong:
+                local_errors[scenario] += 1
+
+        with lock:
+            for scenario, values in local.items():
+                latencies[scenario].extend(values)
+            for scenario, count in local_errors.items():
+                errors[scenario] += count
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_gate.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return dict(latencies), dict(errors), time.perf_counter() - started
@@ -0,0 +1,71 @@
+import json
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(latencies, errors, elapsed):
+    """Throughput and p50/p95/p99 (ms), overall and per scenario."""
+    def stats(values, error_count):
+        values = sorted(values)
+        return {
+            "requests": len(values),
+            "errors": error_count,
+            "throughput_rps": round(len(values) / elapsed, 1),
+            "p50_ms": _ms(percentile(values, 0.50)),
+            "p95_ms": _ms(percentile(values, 0.95)),
+            "p99_ms": _ms(percentile(values, 0.99)),
+        }
+
+    everything = [value for values in latencies.values() for value in values]
+    summary = stats(everything, sum(errors.values()))
+    summary["scenarios"] = {name: stats(values, errors.get(name, 0)) for name, values in sorted(latencies.items())}
+    return summary
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def run_key(run):
+    return f"{run['worker_class']}/c{run['concurrency']}"
+
+
+def print_header():
+    print(f"{'run':<16}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}  rss/worker incl. hash pool (MB)")
+
+
+def print_runs(runs):
+    for run in runs:
+        rss = ", ".join(f"{mb:g}" for mb in run["rss_mb_per_worker"])
+        # Percentiles are None when a run completed no requests
+        p50, p95, p99 = ("-" if run[key] is None else run[key] for key in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{run_key(run):<16}{run['throughput_rps']:>9}{p50:>9}{p95:>9}{p99:>9}{run['errors']:>8}  {rss}")
+
+
+def compare(results, baseline_path, tolerance):
+    """Print deltas against a saved baseline; return the runs that regressed beyond `tolerance`."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {run_key(run): run for run in json.load(f)["runs"]}
+
+    regressions = []
+    print(f"\n{'vs baseline':<16}{'rps':>10}{'p99':>10}")
+    for run in results["runs"]:
+        before = baseline.get(run_key(run))
+        if before is None:
+            continue
+        rps_delta = _delta(before["throughput_rps"], run["throughput_rps"])
+        p99_delta = _delta(before["p99_ms"], run["p99_ms"])
+        print(f"{run_key(run):<16}{rps_delta:>+9.1f}%{p99_delta:>+9.1f}%")
+        if rps_delta < -tolerance * 100 or p99_delta > tolerance * 100:
+            regressions.append(run_key(run))
+    return regressions
+
+
+def _delta(before, after):
+    if not before or after is None:
+        return 0.0
+    return (after - before) / before * 100
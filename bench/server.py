@@ -0,0 +1,133 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_class_available(worker_class):
+    if worker_class != "gevent":
+        return True
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class GunicornServer:
+    """The app under gunicorn against a throwaway SQLite database, torn down on exit."""
+
+    def __init__(self, worker_class="sync", workers=2, threads=4, extra_env=None):
+        self.worker_class = worker_class
+        self.workers = workers
+        self.threads = threads
+        self.port = free_port()
+        self.tmp = tempfile.TemporaryDirectory(prefix="launchpad-bench-")
+        self.env = dict(os.environ)
+        self.env.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(self.tmp.name, 'bench.sqlite')}",
+            "LOG_FILE": os.path.join(self.tmp.name, "app.log"),
+            "METRICS_DIR": os.path.join(self.tmp.name, "metrics"),
+            "DEPLOY_STATE_DIR": os.path.join(self.tmp.name, "deploy"),
+            "PAGE_CACHE_WARM": "1",
+            # The load generator speaks plain HTTP/1.1 and can't skip a 103
+            "EARLY_HINTS": "0",
+        })
+        self.env.update(extra_env or {})
+        self.process = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        subprocess.run([sys.executable, "-m", "flask", "--app", "app", "init-db"],
+                       cwd=BASE_DIR, env=self.env, check=True, capture_output=True)
+        command = [sys.executable, "-m", "gunicorn",
+                   "--workers", str(self.workers),
+                   "--worker-class", self.worker_class,
+                   "--bind", f"127.0.0.1:{self.port}",
+                   "--log-level", "warning"]
+        if self.worker_class == "gthread":
+            command += ["--threads", str(self.threads)]
+        command.append("app:app")
+        self.process = subprocess.Popen(command, cwd=BASE_DIR, env=self.env)
+        self._wait_until_ready()
+        return self
+
+    def __exit__(self, *exc):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.tmp.cleanup()
+
+    def _wait_until_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {self.process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.5).close()
+            except OSError:
+                time.sleep(0.2)
+                continue
+            if len(self.worker_pids()) >= self.workers:
+                return
+            time.sleep(0.2)
+        raise RuntimeError(f"gunicorn did not start within {timeout}s")
+
+    def worker_pids(self):
+        return children_of(self.process.pid)
+
+    def worker_rss_mb(self):
+        """RSS of each worker, plus its password hashing pool processes."""
+        return {pid: round(sum(rss_kb(p) for p in [pid] + descendants_of(pid)) / 1024, 1)
+                for pid in self.worker_pids()}
+
+
+def children_of(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                # The command name may contain spaces, so split after its closing paren
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def descendants_of(pid):
+    found = []
+    for child in children_of(pid):
+        found += [child] + descendants_of(child)
+    return found
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
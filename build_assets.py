@@ -0,0 +1,162 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip variants are still produced
+    brotli = None
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+HASH_LENGTH = 12         # Hex digits of the content hash kept in the file name
+GZIP_LEVEL = 9           # Done once at build time, so use the best ratio
+BROTLI_QUALITY = 11
+
+# Text assets that get .gz / .br siblings (paths relative to static/)
+PRECOMPRESS = [
+    "css/style.css",
+    "js/script.js",
+    "site.webmanifest",
+    "app-ads.txt",
+]
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprinted_name(rel_path, digest):
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def iter_static_files():
+    """Yield every source file under static/ (relative, '/'-separated), skipping dist/."""
+    for dirpath, dirnames, filenames in os.walk(STATIC_DIR):
+        if os.path.abspath(dirpath) == DIST_DIR:
+            dirnames[:] = []
+            continue
+        dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != DIST_DIR]
+        for filename in sorted(filenames):
+            full = os.path.join(dirpath, filename)
+            yield os.path.relpath(full, STATIC_DIR).replace(os.sep, "/")
+
+
+def write_compressed(path):
+    """Write .gz (and .br when available) next to `path`; return the encodings produced."""
+    with open(path, "rb") as f:
+        data = f.read()
+    encodings = []
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=BROTLI_QUALITY))
+        encodings.append("br")
+    # mtime=0 keeps the output byte-identical across builds
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+    encodings.append("gzip")
+    return encodings
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}, "encodings": {}}
+
+
+def manifest_paths(manifest):
+    """Every dist/ file a manifest refers to, compressed variants included (relative to static/)."""
+    paths = set(manifest["files"].values())
+    for hashed, encodings in manifest["encodings"].items():
+        paths.update(hashed + {"br": ".br", "gzip": ".gz"}[encoding] for encoding in encodings)
+    return paths
+
+
+def prune(keep):
+    """Delete dist/ files no longer referenced, so repeated deploys don't grow it forever."""
+    removed = 0
+    for dirpath, _, filenames in os.walk(DIST_DIR, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
+            if path != MANIFEST_PATH and rel_path not in keep:
+                os.remove(path)
+                removed += 1
+        if dirpath != DIST_DIR and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    return removed
+
+
+def build(clean=False):
+    if clean and os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR, exist_ok=True)
+    previous = load_manifest()
+
+    manifest = {"files": {}, "encodings": {}}
+
+    # -----------------------------
+    # STEP 1: Fingerprint everything in static/
+    # -----------------------------
+    for rel_path in iter_static_files():
+        source = os.path.join(STATIC_DIR, rel_path)
+        hashed = "dist/" + fingerprinted_name(rel_path, file_digest(source))
+        target = os.path.join(STATIC_DIR, hashed)
+        manifest["files"][rel_path] = hashed
+
+        # Content-addressed, so an existing target is already correct. The
+        # previous build's hashes are kept for workers still serving its pages.
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+            print(f"🔖 {rel_path} -> {hashed}")
+
+    # -----------------------------
+    # STEP 2: Precompress the text assets
+    # -----------------------------
+    for rel_path in PRECOMPRESS:
+        if rel_path not in manifest["files"]:
+            print(f"⚠️ Skipping {rel_path}, not found.")
+            continue
+        hashed = manifest["files"][rel_path]
+        manifest["encodings"][hashed] = write_compressed(os.path.join(STATIC_DIR, hashed))
+        print(f"🗜️ {hashed} ({', '.join(manifest['encodings'][hashed])})")
+
+    if brotli is None:
+        print("⚠️ brotli is not installed, only gzip variants were written.")
+
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)  # Atomic, so a running worker never reads half a file
+    print(f"✅ Wrote {MANIFEST_PATH} ({len(manifest['files'])} files)")
+
+    # -----------------------------
+    # STEP 3: Drop anything older than the previous build
+    # -----------------------------
+    removed = prune(manifest_paths(manifest) | manifest_paths(previous))
+    if removed:
+        print(f"🧹 Removed {removed} stale files from {DIST_DIR}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress everything in static/.")
+    parser.add_argument("--clean", action="store_true", help="Delete static/dist/ before building.")
+    args = parser.parse_args()
+    build(clean=args.clean)
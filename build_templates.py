@@ -0,0 +1,230 @@
+import json
+import os
+import re
+import sys
+
+from jinja2 import Environment, TemplateSyntaxError
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+BUILD_DIR = os.path.join(TEMPLATES_DIR, "build")
+HINTS_PATH = os.path.join(BUILD_DIR, "hints.json")
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+PAGES = ["home.html", "login.html", "signup.html", "dashboard.html"]
+
+# Classes script.js adds at runtime, so they never appear in the template markup
+DYNAMIC_CLASSES = {"active", "star"}
+# Stylesheets on one origin that load their fonts from another
+FONT_ORIGINS = {"https://fonts.googleapis.com": "https://fonts.gstatic.com"}
+
+# Every way a template names a file under static/
+STATIC_REF_RE = re.compile(
+    r"""(?:url_for\(\s*['"]static['"]\s*,\s*filename\s*=\s*|"""
+    r"""(?:srcset|placeholder_style|background_urls|responsive_background)\(\s*)['"]([^'"]+)['"]""")
+STATIC_STYLESHEET_RE = re.compile(
+    r"""<link\s+rel="stylesheet"\s+href="\{\{\s*url_for\('static',\s*filename='([^']+\.css)'\)\s*\}\}"\s*>""")
+EXTERNAL_RE = re.compile(r"""<(?:link|script)\b[^>]*?\b(?:href|src)="(https://[^/"]+)""", re.IGNORECASE)
+LCP_BACKGROUND_RE = re.compile(r"""responsive_background\(\s*'([^']+)'\s*\)""")
+CLASS_ATTR_RE = re.compile(r"""\bclass="([^"]*)\"""")
+ID_ATTR_RE = re.compile(r"""\bid="([^"]*)\"""")
+TAG_RE = re.compile(r"<([a-zA-Z][a-zA-Z0-9-]*)")
+PROTECTED_RE = re.compile(r"<(script|style|pre|textarea)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+HTML_COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+
+
+# -----------------------------
+# Validation
+# -----------------------------
+def missing_static_files():
+    missing = []
+    for page in sorted(os.listdir(TEMPLATES_DIR)):
+        if not page.endswith(".html"):
+            continue
+        with open(os.path.join(TEMPLATES_DIR, page), encoding="utf-8") as f:
+            html = f.read()
+        for filename in sorted(set(STATIC_REF_RE.findall(html))):
+            if not os.path.isfile(os.path.join(STATIC_DIR, filename)):
+                missing.append(f"{page}: {filename}")
+    return missing
+
+
+# -----------------------------
+# Critical CSS
+# -----------------------------
+def above_the_fold(html):
+    """<head> plus the body up to the end of its first <section> (the hero on home.html)."""
+    body = html.find("<body")
+    end = html.find("</section>", body)
+    return html if body == -1 or end == -1 else html[:end]
+
+
+def used_selectors(html):
+    classes = {name for attr in CLASS_ATTR_RE.findall(html) for name in attr.split()} | DYNAMIC_CLASSES
+    ids = set(ID_ATTR_RE.findall(html))
+    tags = {tag.lower() for tag in TAG_RE.findall(html)} | {"html", "body"}
+    return classes, ids, tags
+
+
+def css_blocks(css):
+    """Split CSS into (prelude, body) pairs, keeping nested at-rule bodies as raw text."""
+    blocks, i = [], 0
+    while True:
+        start = css.find("{", i)
+        if start == -1:
+            return blocks
+        depth, end = 1, start + 1
+        while depth and end < len(css):
+            depth += {"{": 1, "}": -1}.get(css[end], 0)
+            end += 1
+        blocks.append((css[i:start].strip(), css[start + 1:end - 1]))
+        i = end
+
+
+def selector_matches(selector, used):
+    classes, ids, tags = used
+    # Pseudo-classes and attribute selectors depend on state, not on what's in the markup
+    bare = re.sub(r"::?[\w-]+(\([^)]*\))?|\[[^\]]*\]", "", selector)
+    return (set(re.findall(r"\.([\w-]+)", bare)) <= classes
+            and set(re.findall(r"#([\w-]+)", bare)) <= ids
+            and {tag.lower() for tag in re.findall(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)", bare)} <= tags)
+
+
+def minify_declarations(body):
+    body = re.sub(r"\s+", " ", body).strip()
+    return re.sub(r"\s*([:;,])\s*", r"\1", body).rstrip(";")
+
+
+def critical_css(css, used):
+    keyframes, rules = {}, []
+    for prelude, body in css_blocks(CSS_COMMENT_RE.sub("", css)):
+        if prelude.startswith(("@media", "@supports")):
+            inner = critical_css(body, used)
+            if inner:
+                rules.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@keyframes"):
+            keyframes[prelude.split()[1]] = f"{prelude}{{{minify_declarations(body)}}}"
+        elif prelude.startswith("@"):
+            rules.append(f"{prelude}{{{minify_declarations(body)}}}")
+        else:
+            selectors = [s.strip() for s in prelude.split(",") if selector_matches(s.strip(), used)]
+            if selectors:
+                rules.append(f"{','.join(selectors)}{{{minify_declarations(body)}}}")
+    text = "".join(rules)
+    return text + "".join(frames for name, frames in keyframes.items() if name in text)
+
+
+# -----------------------------
+# Resource hints
+# -----------------------------
+def resource_hints(html, stylesheets):
+    """Preconnects for every external origin, preloads for local CSS and the LCP background."""
+    hints = []
+    for origin in dict.fromkeys(EXTERNAL_RE.findall(html)):
+        hints.append({"rel": "preconnect", "href": origin})
+        if origin in FONT_ORIGINS:
+            hints.append({"rel": "preconnect", "href": FONT_ORIGINS[origin], "crossorigin": True})
+    for filename in stylesheets:
+        hints.append({"rel": "preload", "as": "style", "filename": filename})
+    lcp = LCP_BACKGROUND_RE.search(above_the_fold(html))
+    if lcp:
+        hints.append({"rel": "preload", "as": "image", "background": lcp.group(1)})
+    return hints
+
+
+def hint_tags(hints):
+    """The same hints as <link> tags, left as Jinja so URLs resolve through the asset manifest."""
+    tags = []
+    for hint in hints:
+        if hint["rel"] == "preconnect":
+            crossorigin = " crossorigin" if hint.get("crossorigin") else ""
+            tags.append(f'<link rel="preconnect" href="{hint["href"]}"{crossorigin}>')
+        elif "background" in hint:
+            tags.append(f"{{% set lcp_small, lcp_large = background_urls('{hint['background']}') %}}"
+                        '<link rel="preload" as="image" href="{{ lcp_small }}" media="(max-width: 767px)">'
+                        '<link rel="preload" as="image" href="{{ lcp_large }}" media="(min-width: 768px)">')
+        else:
+            tags.append(f'<link rel="preload" as="{hint["as"]}" '
+                        f"href=\"{{{{ url_for('static', filename='{hint['filename']}') }}}}\">")
+    return "".join(tags)
+
+
+# -----------------------------
+# HTML
+# -----------------------------
+def minify_html(html):
+    """Drop comments and collapse whitespace, leaving script/style/pre/textarea untouched."""
+    protected = []
+
+    def protect(match):
+        protected.append(match.group(0))
+        return f"\x00{len(protected) - 1}\x00"
+
+    html = PROTECTED_RE.sub(protect, html)
+    html = HTML_COMMENT_RE.sub("", html)
+    html = re.sub(r"\s+", " ", html).strip()
+    return re.sub(r"\x00(\d+)\x00", lambda m: protected[int(m.group(1))], html)
+
+
+def build_page(page):
+    with open(os.path.join(TEMPLATES_DIR, page), encoding="utf-8") as f:
+        html = f.read()
+
+    stylesheets = STATIC_STYLESHEET_RE.findall(html)
+    used = used_selectors(above_the_fold(html))
+    for filename in stylesheets:
+        with open(os.path.join(STATIC_DIR, filename), encoding="utf-8") as f:
+            critical = critical_css(f.read(), used)
+        href = f"{{{{ url_for('static', filename='{filename}') }}}}"
+        # Inline what the first screen needs; load the rest without blocking render.
+        # Raw, since minified CSS like '@media (...){#id{...}}' contains Jinja's '{#'.
+        deferred = (f"<style>{{% raw %}}{critical}{{% endraw %}}</style>"
+                    f"<link rel=\"stylesheet\" href=\"{href}\" media=\"print\" onload=\"this.media='all'\">"
+                    f"<noscript><link rel=\"stylesheet\" href=\"{href}\"></noscript>")
+        html = STATIC_STYLESHEET_RE.sub(lambda m: deferred if m.group(1) == filename else m.group(0), html)
+        print(f"🎨 {page}: inlined {len(critical)} of {os.path.getsize(os.path.join(STATIC_DIR, filename))} bytes of {filename}")
+
+    hints = resource_hints(html, stylesheets)
+    # Right after <meta charset>, which has to stay first in <head>; after <head> if there is none
+    anchor = re.search(r"<meta charset=[^>]*>", html) or re.search(r"<head(?:\s[^>]*)?>", html)
+    if anchor:
+        html = html[:anchor.end()] + hint_tags(hints) + html[anchor.end():]
+
+    built = minify_html(html)
+    print(f"✅ {page}: {len(html)} -> {len(built)} bytes, {len(hints)} hints")
+    return built, hints
+
+
+def build():
+    missing = missing_static_files()
+    if missing:
+        for entry in missing:
+            print(f"❌ Missing static file referenced by {entry}")
+        return False
+
+    built = {page: build_page(page) for page in PAGES}
+    # Workers load these at boot, so a copy Jinja can't parse must fail the deploy, not the reload
+    for page, (html, _) in built.items():
+        try:
+            Environment().parse(html)
+        except TemplateSyntaxError as e:
+            print(f"❌ {page}: built copy isn't a valid template ({e.message}, line {e.lineno})")
+            return False
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    for page, (html, _) in built.items():
+        with open(os.path.join(BUILD_DIR, page), "w", encoding="utf-8") as f:
+            f.write(html)
+    hints = {page: page_hints for page, (_, page_hints) in built.items()}
+    tmp_path = HINTS_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(hints, f, indent=2)
+    os.replace(tmp_path, HINTS_PATH)
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if build() else 1)
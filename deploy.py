@@ -0,0 +1,188 @@
+import argparse
+import fcntl
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from build_assets import STATIC_DIR, load_manifest, manifest_paths
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Run after the pull so the new tree is fingerprinted before any worker boots on it
+BUILD_STEPS = [
+    [sys.executable, os.path.join(BASE_DIR, "webpify.py")],
+    [sys.executable, os.path.join(BASE_DIR, "build_assets.py")],
+    # Also fails the deploy if a template points at a static file that doesn't exist
+    [sys.executable, os.path.join(BASE_DIR, "build_templates.py")],
+]
+STEP_TIMEOUT = 600
+
+
+class DeployCoordinator:
+    """Coalescing, one-at-a-time deploys shared by every gunicorn worker.
+
+    Each verified push appends a line to `deploy.pending` and starts a
+    runner process. Whichever runner holds `deploy.lock` consumes all
+    pending pushes as a single deploy; the others exit straight away. The
+    last run is recorded in `deploy.json`, script output in `deploy.log`.
+    """
+
+    def __init__(self, script, state_dir, gunicorn_pid_file=None, warm_urls=()):
+        self.script = script
+        self.state_dir = state_dir
+        self.gunicorn_pid_file = gunicorn_pid_file
+        self.warm_urls = list(warm_urls)
+        self.pending_path = os.path.join(state_dir, "deploy.pending")
+        self.lock_path = os.path.join(state_dir, "deploy.lock")
+        self.state_path = os.path.join(state_dir, "deploy.json")
+        self.log_path = os.path.join(state_dir, "deploy.log")
+
+    # -----------------------------
+    # Called from the webhook, inside a worker
+    # -----------------------------
+    def request(self, reason=""):
+        os.makedirs(self.state_dir, exist_ok=True)
+        with open(self.pending_path, "a", encoding="utf-8") as f:
+            f.write(f"{time.time():.3f} {reason}\n")
+
+        args = [sys.executable, os.path.abspath(__file__), "run",
+                "--script", self.script, "--state-dir", self.state_dir]
+        # A gunicorn worker's parent is the master; anywhere else it could be a shell
+        if os.environ.get("SERVER_SOFTWARE", "").startswith("gunicorn"):
+            args += ["--gunicorn-pid", str(os.getppid())]
+        if self.gunicorn_pid_file:
+            args += ["--gunicorn-pid-file", self.gunicorn_pid_file]
+        for url in self.warm_urls:
+            args += ["--warm-url", url]
+        runner = subprocess.Popen(args, cwd=BASE_DIR, start_new_session=True,
+                                  stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Reap the runner so it never lingers as a zombie of the worker
+        threading.Thread(target=runner.wait, name="deploy-reaper", daemon=True).start()
+
+    def last_run(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    # -----------------------------
+    # Runner process
+    # -----------------------------
+    def run_pending(self, gunicorn_pid=None):
+        while True:
+            with open(self.lock_path, "w") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return  # The runner holding the lock will pick our push up
+                while os.path.exists(self.pending_path):
+                    self._deploy(self._take_pending(), gunicorn_pid)
+            # A push may have landed between the last check and the unlock
+            if not os.path.exists(self.pending_path):
+                return
+
+    def _take_pending(self):
+        taken = self.pending_path + ".taken"
+        os.replace(self.pending_path, taken)
+        with open(taken, encoding="utf-8") as f:
+            pushes = sum(1 for _ in f)
+        os.remove(taken)
+        return pushes
+
+    def _deploy(self, pushes, gunicorn_pid):
+        state = {"status": "running", "pushes": pushes, "started_at": time.time()}
+        self._write_state(state)
+        start = time.perf_counter()
+
+        exit_code, failed_step = 0, None
+        with open(self.log_path, "a", encoding="utf-8") as log:
+            log.write(f"=== {time.strftime('%Y-%m-%d %H:%M:%S')} deploying {pushes} push(es)\n")
+            log.flush()
+            for step in [[self.script]] + BUILD_STEPS:
+                try:
+                    exit_code = subprocess.run(step, cwd=BASE_DIR, stdout=log, stderr=subprocess.STDOUT,
+                                               timeout=STEP_TIMEOUT).returncode
+                except (OSError, subprocess.TimeoutExpired) as e:
+                    log.write(f"{e}\n")
+                    exit_code = -1
+                if exit_code != 0:
+                    failed_step = " ".join(step)
+                    break
+
+            if exit_code == 0:
+                warm_static_files()
+                self._reload(gunicorn_pid, log)
+                self._warm_urls(log)
+
+        state.update({
+            "status": "succeeded" if exit_code == 0 else "failed",
+            "exit_code": exit_code,
+            "failed_step": failed_step,
+            "finished_at": time.time(),
+            "duration_s": round(time.perf_counter() - start, 3),
+        })
+        self._write_state(state)
+
+    def _reload(self, gunicorn_pid, log):
+        """SIGHUP makes gunicorn start fresh workers and retire the old ones once they finish their requests."""
+        try:
+            if self.gunicorn_pid_file:
+                with open(self.gunicorn_pid_file, encoding="utf-8") as f:
+                    gunicorn_pid = int(f.read().strip())
+            if not gunicorn_pid or gunicorn_pid == 1:
+                log.write("No gunicorn master pid, skipping reload\n")
+                return
+            os.kill(gunicorn_pid, signal.SIGHUP)
+        except (OSError, ValueError) as e:
+            log.write(f"Reload failed: {e}\n")
+            return
+        log.write(f"Sent SIGHUP to gunicorn master {gunicorn_pid}\n")
+
+    def _warm_urls(self, log):
+        # New workers warm their own page cache at boot (PAGE_CACHE_WARM, on by default); these
+        # requests just make sure the first real visitor isn't the one paying for imports.
+        time.sleep(2)
+        for url in self.warm_urls:
+            try:
+                with urllib.request.urlopen(url, timeout=10) as response:
+                    response.read()
+            except OSError as e:
+                log.write(f"Warm-up request to {url} failed: {e}\n")
+
+    def _write_state(self, state):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+
+def warm_static_files():
+    """Read the current build's assets once so the new workers serve them from the OS page cache."""
+    for rel_path in sorted(manifest_paths(load_manifest())):
+        try:
+            with open(os.path.join(STATIC_DIR, rel_path), "rb") as f:
+                while f.read(1 << 20):
+                    pass
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued deploys one at a time.")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("--script", required=True)
+    parser.add_argument("--state-dir", required=True)
+    parser.add_argument("--gunicorn-pid", type=int, default=None)
+    parser.add_argument("--gunicorn-pid-file", default=None)
+    parser.add_argument("--warm-url", action="append", default=[])
+    args = parser.parse_args()
+    coordinator = DeployCoordinator(args.script, args.state_dir, args.gunicorn_pid_file, args.warm_url)
+    coordinator.run_pending(args.gunicorn_pid)
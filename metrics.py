@@ -0,0 +1,260 @@
+import fcntl
+import functools
+import glob
+import hmac
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, abort, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HISTOGRAMS = {'http_request_duration_seconds'}
+_INITIAL_SIZE = 64 * 1024
+# Where the counts of exited workers end up, so reloads don't grow the directory
+EXITED_WORKERS_FILE = 'metrics_exited.db'
+
+
+class MmapedValues:
+    """Append-only key -> float64 store in a memory-mapped file, one per worker process.
+
+    Layout: a uint32 count of used bytes, then entries of
+    (uint32 key length, utf-8 key padded to 8 bytes, float64 value).
+    Only the owning process writes (EXITED_WORKERS_FILE only under the scrape
+    lock); the /metrics view of any worker reads every worker's file and sums them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = struct.unpack_from('<i', self._map, 0)[0] or 8
+        for key, _, pos in _read_entries(self._map, self._used):
+            self._positions[key] = pos
+
+    def _add_key(self, key):
+        encoded = key.encode('utf-8')
+        padded = encoded + b' ' * (8 - (len(encoded) + 4) % 8)
+        entry = struct.pack(f'<i{len(padded)}sd', len(encoded), padded, 0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._map[self._used:self._used + len(entry)] = entry
+        self._used += len(entry)
+        # Publish the entry only after it is fully written
+        struct.pack_into('<i', self._map, 0, self._used)
+        self._positions[key] = self._used - 8
+        return self._positions[key]
+
+    def add(self, key, amount):
+        with self._lock:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self._add_key(key)
+            struct.pack_into('<d', self._map, pos, struct.unpack_from('<d', self._map, pos)[0] + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _read_entries(data, used):
+    pos = 8
+    while pos < used:
+        key_length = struct.unpack_from('<i', data, pos)[0]
+        key = bytes(data[pos + 4:pos + 4 + key_length]).decode('utf-8')
+        pos += 4 + key_length + (8 - (key_length + 4) % 8)
+        yield key, struct.unpack_from('<d', data, pos)[0], pos
+        pos += 8
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 8:
+        return
+    used = min(struct.unpack_from('<i', data, 0)[0], len(data))
+    for key, value, _ in _read_entries(data, used):
+        yield key, value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, just not ours
+    return True
+
+
+def fold_exited_workers(directory):
+    """Add the files of workers that are gone into EXITED_WORKERS_FILE and delete them."""
+    exited = None
+    for path in glob.glob(os.path.join(directory, 'metrics_*.db')):
+        pid = os.path.basename(path)[len('metrics_'):-len('.db')]
+        if not pid.isdigit() or _pid_alive(int(pid)):
+            continue
+        if exited is None:
+            exited = MmapedValues(os.path.join(directory, EXITED_WORKERS_FILE))
+        for key, value in _read_file(path):
+            exited.add(key, value)
+        os.unlink(path)
+    if exited is not None:
+        exited.close()
+
+
+def read_all(directory):
+    """Sum every worker's values, including workers that have since exited (counters stay monotonic)."""
+    totals = defaultdict(float)
+    # One scrape at a time, so a file is never both folded and summed on its own
+    with open(os.path.join(directory, 'metrics.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        fold_exited_workers(directory)
+        for path in glob.glob(os.path.join(directory, 'metrics_*.db')):
+            for key, value in _read_file(path):
+                totals[key] += value
+    return totals
+
+
+@functools.lru_cache(maxsize=None)  # Bounded by endpoints x statuses, saves formatting on every request
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in sorted(labels.items())) + '}'
+
+
+def render_prometheus(totals):
+    lines, typed = [], set()
+    for key in sorted(totals):
+        name = key.split('{', 1)[0]
+        family, kind = name, 'counter'
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in HISTOGRAMS:
+                family, kind = name[:-len(suffix)], 'histogram'
+        if family not in typed:
+            typed.add(family)
+            lines.append(f'# TYPE {family} {kind}')
+        lines.append(f'{key} {totals[key]!r}')
+    return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """Per-request timing for views, SQL, password hashing and template rendering.
+
+    Adds a Server-Timing header to every response and exposes everything
+    recorded by every gunicorn worker at /metrics in Prometheus text format.
+    Both the per-phase breakdown and /metrics need 'Authorization: Bearer
+    <METRICS_TOKEN>'; everyone else only sees the total. Which phases ran
+    gives away too much, e.g. 'hash' on a login means the email exists.
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.token = None
+        self._store = None
+        self._store_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config['METRICS_DIR']
+        self.token = app.config['METRICS_TOKEN']
+        os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        event.listen(Engine, 'before_cursor_execute', self._before_query)
+        event.listen(Engine, 'after_cursor_execute', self._after_query)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    @property
+    def store(self):
+        # Opened lazily so each forked gunicorn worker gets its own file
+        if self._store is None or self._store_pid != os.getpid():
+            self._store = MmapedValues(os.path.join(self.directory, f'metrics_{os.getpid()}.db'))
+            self._store_pid = os.getpid()
+        return self._store
+
+    def trusted(self):
+        """Without a METRICS_TOKEN configured, nobody is."""
+        expected = f'Bearer {self.token}'.encode()
+        return bool(self.token) and hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected)
+
+    def record_phase(self, name, seconds, count=1):
+        if has_request_context() and 'metrics_phases' in g:
+            phase = g.metrics_phases[name]
+            phase[0] += seconds
+            phase[1] += count
+
+    def _start(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_phases = defaultdict(lambda: [0.0, 0])
+
+    # The start lives on the execution context, which is discarded with the statement,
+    # so a query that fails (no after_cursor_execute) leaves nothing behind on the connection.
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_query_start = time.perf_counter()
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, 'metrics_query_start', None)
+        if start is not None:
+            self.record_phase('db', time.perf_counter() - start)
+
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context():
+            g.metrics_render_start = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        if has_request_context() and 'metrics_render_start' in g:
+            self.record_phase('render', time.perf_counter() - g.pop('metrics_render_start'))
+
+    def _finish(self, response):
+        if 'metrics_start' not in g or request.endpoint == 'metrics':
+            return response
+        elapsed = time.perf_counter() - g.metrics_start
+        endpoint = request.endpoint or 'unmatched'  # Never label by raw path, 404 scans would explode it
+
+        store = self.store
+        for bound in LATENCY_BUCKETS:
+            # Add 0 too, so every bucket exists for histogram_quantile()
+            store.add(f'http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)}', elapsed <= bound)
+        store.add(f'http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le="+Inf")}', 1)
+        store.add(f'http_request_duration_seconds_sum{_labels(endpoint=endpoint)}', elapsed)
+        store.add(f'http_request_duration_seconds_count{_labels(endpoint=endpoint)}', 1)
+        store.add(f'http_requests_total{_labels(endpoint=endpoint, status=response.status_code)}', 1)
+
+        timings = []
+        for phase, (seconds, count) in g.metrics_phases.items():
+            store.add(f'request_phase_seconds_total{_labels(endpoint=endpoint, phase=phase)}', seconds)
+            store.add(f'request_phase_operations_total{_labels(endpoint=endpoint, phase=phase)}', count)
+            timings.append(f'{phase};dur={seconds * 1000:.2f};desc="{count} calls"')
+        if not self.trusted():
+            timings = []
+        timings.append(f'total;dur={elapsed * 1000:.2f}')
+        response.headers.add('Server-Timing', ', '.join(timings))
+        return response
+
+    def view(self):
+        if not self.trusted():
+            abort(403)
+        return Response(render_prometheus(read_all(self.directory)), mimetype='text/plain; version=0.0.4')
+
+
+def default_metrics_dir():
+    return os.path.join(tempfile.gettempdir(), 'launchpad-metrics')
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool already has as much work queued as it is allowed."""
+
+
+class PasswordHasher:
+    """Runs scrypt hashing in a small per-worker process pool.
+
+    At most `max_pending` hashes may be running or queued at once; anything
+    beyond that fails fast with PasswordHasherBusy so the caller can answer
+    503 instead of piling up requests behind a few hundred ms of CPU each.
+    """
+
+    def __init__(self, workers=2, max_pending=8, n=2**15, r=8, p=1, timeout=10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.method = f"scrypt:{n}:{r}:{p}"
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self.observe = None  # Optional callback(seconds) for each hash or verify
+
+    def _get_pool(self):
+        # Created lazily and per PID: a pool inherited across gunicorn's fork
+        # would point at the master's children. Children come from a forkserver,
+        # not a fork of this multi-threaded worker, so they don't inherit its
+        # threads or run its at-fork hooks (applog would start a log writer in each).
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("forkserver"))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        start = time.perf_counter()
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy() from None
+        finally:
+            if self.observe is not None:
+                self.observe(time.perf_counter() - start)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Return (matches, needs_rehash) for a stored hash."""
+        if not self._run(check_password_hash, pwhash, password):
+            return False, False
+        return True, self.needs_rehash(pwhash)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split("$", 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
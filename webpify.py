@@ -1,7 +1,12 @@
+import argparse
+import hashlib
+import json
+import math
 import os
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
 from PIL import Image
 
 # -----------------------------
@@ -9,94 +14,206 @@ from PIL import Image
 # -----------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
-IMAGES_DIR = os.path.join(BASE_DIR, "static/images")
-DELETE_OLD = False       # Keep original backups if True -> deletes
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+OUTPUT_DIR = os.path.join(STATIC_DIR, "images", "optimized")
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "manifest.json")
 WEBP_QUALITY = 75        # 60–80 is good balance
-WEBP_METHOD = 6          # Best compression
-
-# -----------------------------
-# STEP 1: Collect <img> sizes
-# -----------------------------
-image_usage = {}  # {src: {"width": w, "height": h}}
-
-chrome_options = Options()
-chrome_options.add_argument("--headless")
-driver = webdriver.Chrome(options=chrome_options)
-
-for template_file in os.listdir(TEMPLATES_DIR):
-    if not template_file.endswith(".html"):
-        continue
-    path = os.path.join(TEMPLATES_DIR, template_file)
-    driver.get("file://" + os.path.abspath(path))
-
-    with open(path, "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "html.parser")
-
-    for img in soup.find_all("img"):
-        src = img.get("src")
-        if not src:
+WEBP_METHOD = 6          # Best compression, affordable now that unchanged images are skipped
+DENSITIES = (1, 2)       # 1x and 2x variants for every display size
+PLACEHOLDER_WIDTH = 16   # Tiny blurred stand-in, inlined by app.py while the real image loads
+PLACEHOLDER_QUALITY = 30
+
+# Display boxes (CSS px) for images sized by style.css instead of width/height
+# attributes. Keep in sync with the selectors noted on each line.
+# The logos aren't listed: their sources are already smaller than they are shown.
+CSS_SIZES = {
+    "images/max.webp": (160, 160),          # .founder-photo { width: 10rem; height: 10rem }
+    "images/stanley.webp": (128, 128),      # .team-photo-wrapper { width: 8rem; height: 8rem }
+    "images/dylan.webp": (128, 128),
+    "images/oliv.webp": (128, 128),
+    "images/glint.webp": (128, 128),
+    "images/josephdylan.webp": (128, 128),
+}
+
+# Full-bleed backgrounds (.hero-slide, background-size: cover) get one variant
+# per breakpoint instead of per density: phones take the first, desktops the last.
+BACKGROUND_WIDTHS = {
+    "images/background1.webp": (960, 1920),
+    "images/background2.webp": (960, 1920),
+    "images/background3.webp": (960, 1920),
+}
+
+IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE | re.DOTALL)
+STATIC_FILENAME_RE = re.compile(r"""url_for\(\s*['"]static['"]\s*,\s*filename\s*=\s*['"]([^'"]+)['"]""")
+WIDTH_ATTR_RE = re.compile(r"""\swidth=['"]?(\d+)""", re.IGNORECASE)
+HEIGHT_ATTR_RE = re.compile(r"""\sheight=['"]?(\d+)""", re.IGNORECASE)
+
+
+def collect_display_sizes():
+    """Map every static image to the largest box it is displayed in, without a browser."""
+    sizes = dict(CSS_SIZES)
+
+    for template_file in sorted(os.listdir(TEMPLATES_DIR)):
+        if not template_file.endswith(".html"):
             continue
-
-        try:
-            element = driver.find_element("css selector", f'img[src="{src}"]')
-            size = element.size
-        except:
-            # fallback: width/height attributes
-            size = {"width": int(img.get("width") or 0), "height": int(img.get("height") or 0)}
-
-        if src in image_usage:
-            image_usage[src]["width"] = max(image_usage[src]["width"], size["width"])
-            image_usage[src]["height"] = max(image_usage[src]["height"], size["height"])
+        with open(os.path.join(TEMPLATES_DIR, template_file), "r", encoding="utf-8") as f:
+            html = f.read()
+
+        for tag in IMG_TAG_RE.findall(html):
+            src = STATIC_FILENAME_RE.search(tag)
+            width, height = WIDTH_ATTR_RE.search(tag), HEIGHT_ATTR_RE.search(tag)
+            if not src or not width or not height:
+                continue
+            box = (int(width.group(1)), int(height.group(1)))
+            previous = sizes.get(src.group(1), (0, 0))
+            sizes[src.group(1)] = (max(previous[0], box[0]), max(previous[1], box[1]))
+
+    return sizes
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def variant_path(rel_path, suffix):
+    stem = os.path.splitext(os.path.relpath(rel_path, "images"))[0]
+    return f"images/optimized/{stem}-{suffix}.webp"
+
+
+def plan_widths(rel_path, box, source_width, source_height):
+    """Pixel widths to encode for one source image, never upscaling."""
+    if rel_path in BACKGROUND_WIDTHS:
+        wanted = BACKGROUND_WIDTHS[rel_path]
+    else:
+        # Fill the box the way object-fit: cover would, at every density
+        scale = max(box[0] / source_width, box[1] / source_height)
+        wanted = [math.ceil(source_width * scale * density) for density in DENSITIES]
+    return sorted({min(width, source_width) for width in wanted})
+
+
+def encode_image(job):
+    """Worker: encode every variant of one source image. Runs in a child process."""
+    source = os.path.join(STATIC_DIR, job["source"])
+    im = Image.open(source)
+    im.load()
+    source_is_webp = im.format == "WEBP"
+    if im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+
+    variants = []
+    for width in job["widths"]:
+        out = variant_path(job["source"], f"{width}w")
+        os.makedirs(os.path.dirname(os.path.join(STATIC_DIR, out)), exist_ok=True)
+        if width == im.width and source_is_webp:
+            # Full size: the source is already a WebP, a second lossy pass would only lose detail
+            shutil.copyfile(source, os.path.join(STATIC_DIR, out))
         else:
-            image_usage[src] = {"width": size["width"], "height": size["height"]}
-
-driver.quit()
-
-# -----------------------------
-# STEP 2: Resize + Compress
-# -----------------------------
-for src, size in image_usage.items():
-    filename = os.path.basename(src.replace("/", os.sep))
-    original_path = os.path.join(IMAGES_DIR, filename)
-
-    if not os.path.exists(original_path):
-        print(f"⚠️ Skipping {original_path}, not found.")
-        continue
-
-    webp_path = os.path.splitext(original_path)[0] + ".webp"
-    im = Image.open(original_path)
-
-    max_width, max_height = size["width"], size["height"]
-
-    if max_width > 0 and max_height > 0:
-        scale_factor = min(max_width / im.width, max_height / im.height, 1)
-        new_size = (int(im.width * scale_factor), int(im.height * scale_factor))
-        if new_size != im.size:
-            print(f"📉 Resizing {filename} from {im.size} -> {new_size}")
-            im = im.resize(new_size, Image.LANCZOS)
-
-    im.save(webp_path, "WEBP", quality=WEBP_QUALITY, method=WEBP_METHOD)
-
-    if DELETE_OLD and original_path != webp_path:
-        os.remove(original_path)
-
-    print(f"✅ Optimized {filename} -> {webp_path}")
-
-# -----------------------------
-# STEP 3: Update HTML templates
-# -----------------------------
-for template_file in os.listdir(TEMPLATES_DIR):
-    if not template_file.endswith(".html"):
-        continue
-    path = os.path.join(TEMPLATES_DIR, template_file)
-    with open(path, "r", encoding="utf-8") as f:
-        html = f.read()
-
-    for src in image_usage.keys():
-        webp_src = os.path.splitext(src)[0] + ".webp"
-        html = html.replace(src, webp_src)
-
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(html)
+            height = max(1, round(im.height * width / im.width))
+            resized = im if width == im.width else im.resize((width, height), Image.LANCZOS)
+            resized.save(os.path.join(STATIC_DIR, out), "WEBP", quality=WEBP_QUALITY, method=WEBP_METHOD)
+        variants.append([width, out])
+
+    placeholder = variant_path(job["source"], "placeholder")
+    height = max(1, round(im.height * PLACEHOLDER_WIDTH / im.width))
+    im.resize((PLACEHOLDER_WIDTH, height), Image.LANCZOS).save(
+        os.path.join(STATIC_DIR, placeholder), "WEBP", quality=PLACEHOLDER_QUALITY, method=WEBP_METHOD)
+
+    return job["source"], {
+        "hash": job["hash"],
+        "settings": job["settings"],
+        "width": im.width,
+        "height": im.height,
+        "variants": variants,
+        "placeholder": placeholder,
+    }
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def is_fresh(entry, job):
+    if not entry or entry["hash"] != job["hash"] or entry["settings"] != job["settings"]:
+        return False
+    outputs = [path for _, path in entry["variants"]] + [entry["placeholder"]]
+    return all(os.path.exists(os.path.join(STATIC_DIR, path)) for path in outputs)
+
+
+def optimize(workers=None, force=False):
+    # -----------------------------
+    # STEP 1: Work out what each image needs
+    # -----------------------------
+    sizes = collect_display_sizes()
+    for rel_path in BACKGROUND_WIDTHS:
+        sizes.setdefault(rel_path, (0, 0))
+
+    previous = load_manifest()
+    manifest = {}
+    jobs = []
+    for rel_path, box in sorted(sizes.items()):
+        source = os.path.join(STATIC_DIR, rel_path)
+        if not os.path.exists(source):
+            print(f"⚠️ Skipping {rel_path}, not found.")
+            continue
 
-    print(f"🔄 Updated {template_file} to use optimized WebP images.")
+        with Image.open(source) as im:  # Only reads the header
+            widths = plan_widths(rel_path, box, im.width, im.height)
+            if widths == [im.width] and rel_path not in BACKGROUND_WIDTHS:
+                continue  # Nothing smaller to offer, templates keep using the original
+        job = {
+            "source": rel_path,
+            "hash": file_digest(source),
+            "widths": widths,
+            "settings": f"q{WEBP_QUALITY}-m{WEBP_METHOD}-w{','.join(map(str, widths))}-p{PLACEHOLDER_WIDTH}",
+        }
+        if force or not is_fresh(previous.get(rel_path), job):
+            jobs.append(job)
+        else:
+            manifest[rel_path] = previous[rel_path]
+
+    # Images no template shows any more drop out of the manifest, along with their files
+    planned = manifest.keys() | {job["source"] for job in jobs}
+    for rel_path in previous.keys() - planned:
+        entry = previous[rel_path]
+        for path in [path for _, path in entry["variants"]] + [entry.get("placeholder")]:
+            if path and os.path.exists(os.path.join(STATIC_DIR, path)):
+                os.remove(os.path.join(STATIC_DIR, path))
+    if not jobs and manifest.keys() == previous.keys():
+        print("✅ All images up to date.")
+        return manifest
+
+    # -----------------------------
+    # STEP 2: Resize + Compress in parallel
+    # -----------------------------
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rel_path, entry in pool.map(encode_image, jobs):
+            manifest[rel_path] = entry
+            widths = ", ".join(f"{width}w" for width, _ in entry["variants"])
+            print(f"✅ Optimized {rel_path} -> {widths} + placeholder")
+
+    # -----------------------------
+    # STEP 3: Write the manifest read by app.py's srcset() helpers
+    # -----------------------------
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+    print(f"🔄 Wrote {MANIFEST_PATH} ({len(jobs)} of {len(manifest)} images rebuilt)")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build responsive WebP variants for the images used in templates/.")
+    parser.add_argument("--workers", type=int, default=None, help="Encoder processes (default: one per CPU).")
+    parser.add_argument("--force", action="store_true", help="Re-encode every image even if unchanged.")
+    args = parser.parse_args()
+    optimize(workers=args.workers, force=args.force)